@@ -6,20 +6,185 @@ This module provides functions to interact with Claude via the Anthropic API
 for decomposing specifications and implementing issues.
 """
 
+import asyncio
+import hashlib
 import json
 import os
+import re
+import shutil
+import string
 import subprocess
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 
-from anthropic import Anthropic
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
 from loguru import logger
+from pydantic import BaseModel, Field, TypeAdapter
+
+MODEL = "claude-sonnet-4-20250514"
+
+CONTINUE_FEEDBACK = "Continue with implementation. What's your next step?"
+
+# Issues created per GraphQL request; mutations in one request run serially,
+# so this bounds request size rather than concurrency
+ISSUES_PER_MUTATION = 20
+
+# Files listed in the project context given to Claude when implementing
+CONTEXT_FILE_EXTENSIONS = {".py", ".js", ".ts", ".go", ".rs"}
+CONTEXT_FILE_NAMES = {"package.json", "pyproject.toml"}
+
+# Seconds between progress logs while a response is streaming
+HEARTBEAT_INTERVAL = 5.0
+
+# Phrases with which Claude reports a finished implementation
+COMPLETION_PATTERN = re.compile(
+    r"implementation complete|all tests pass", re.IGNORECASE
+)
+# Characters of already-scanned text to rescan when a stream chunk arrives,
+# so a phrase split across chunks is still matched
+COMPLETION_OVERLAP = len("implementation complete") - 1
+
+# Cheaper model for implement turns that only plan or analyze; turns that
+# write code use MODEL. A turn counts as planning if it is the first one or
+# Claude's previous message matches PLANNING_PATTERN.
+PLANNING_MODEL = "claude-3-5-haiku-20241022"
+PLANNING_PATTERN = re.compile(
+    r"\b(?:plan(?:s|ned|ning)?|approach(?:es)?|analy(?:[sz](?:e|es|ed|ing)|sis))\b",
+    re.IGNORECASE,
+)
+
+# History compaction for long implement runs: the last KEEP_TURNS
+# exchanges are sent verbatim, older ones are folded into a summary by
+# SUMMARY_MODEL every SUMMARY_INTERVAL turns
+SUMMARY_MODEL = "claude-3-5-haiku-20241022"
+KEEP_TURNS = 6
+SUMMARY_INTERVAL = 5
+
+# Decomposition results keyed by spec content, model, system prompt text and
+# cache format. Bump DECOMPOSE_CACHE_VERSION whenever the cached
+# Decomposition format changes; prompt edits change the key by themselves.
+DECOMPOSE_CACHE_DIR = Path.home() / ".claude" / "decompose_cache"
+DECOMPOSE_CACHE_TTL = 7 * 24 * 60 * 60
+DECOMPOSE_CACHE_VERSION = 2
+
+# Static decomposition instructions. They are far below the minimum cacheable
+# prefix (1024 tokens for Sonnet), so they carry no cache breakpoint; repeated
+# decompositions of the same spec are served from DECOMPOSE_CACHE_DIR instead.
+DECOMPOSE_SYSTEM_PROMPT = [
+    {
+        "type": "text",
+        "text": """Read the specification provided by the user and decompose it into implementable GitHub issues.
 
+For each issue you identify:
+1. Create a clear, specific title
+2. Write detailed acceptance criteria
+3. Specify what unit tests are required
+4. Identify dependencies on other issues (by issue number)
+
+Guidelines:
+- Break down large features into smaller, testable units
+- Issue #0 should be test framework setup if not already present
+- Ensure each issue can be implemented independently once dependencies are met
+- Order issues logically (foundations before features)
+- Use "depends on #N" in issue body to indicate dependencies
+
+Output a JSON array of issues with this structure:
+[
+  {
+    "number": 0,
+    "title": "Setup test framework",
+    "body": "Description\\n\\n## Dependencies\\nNone\\n\\n## Acceptance Criteria\\n- [ ] pytest installed\\n- [ ] Sample test passes\\n\\n## Tests Required\\n- Verify test framework works",
+    "deps": []
+  },
+  {
+    "number": 1,
+    "title": "Implement user model",
+    "body": "Description\\n\\n## Dependencies\\n- #0\\n\\n## Acceptance Criteria\\n- [ ] User class created\\n\\n## Tests Required\\n- Unit tests for User model",
+    "deps": [0]
+  }
+]
+
+Only output the JSON array, nothing else.""",
+    }
+]
+
+# Task instructions are identical for every issue; only the issue details, from
+# IMPLEMENT_PROMPT_TEMPLATE, vary. Too short to cache on their own, they are
+# cached as part of the conversation prefix (see _with_cache_breakpoints).
+IMPLEMENT_SYSTEM_PROMPT = [
+    {
+        "type": "text",
+        "text": """You are implementing a GitHub issue.
+
+Your task:
+1. Write comprehensive unit tests for this feature (TDD approach)
+2. Implement the feature to make tests pass
+3. Run the full test suite to ensure no regressions
+4. Ensure all tests pass before completing
+
+Follow the project's existing patterns and conventions. If you need to read or write files, describe what you need and I'll help.
+
+Start by analyzing the requirements and planning your test cases.""",
+    }
+]
+
+IMPLEMENT_PROMPT_TEMPLATE = string.Template("""ISSUE NUMBER: #$issue_number
+
+ISSUE TITLE: $title
+
+ISSUE BODY:
+$body
+
+PROJECT CONTEXT:
+$context""")
+
+
+# Process umask, read once at import (os.umask can only be read by setting it)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Issue lookups made in this process, keyed by issue number, least recently
+# used first. Entries are tasks so concurrent lookups of one issue share a
+# single `gh issue view`; failed lookups are dropped so they can be retried.
+ISSUE_CACHE_SIZE = 128
+_issue_cache: OrderedDict[int, asyncio.Task] = OrderedDict()
+
+
+class DecomposedIssue(BaseModel):
+    """A single issue proposed by Claude when decomposing a specification."""
+
+    number: int = Field(..., description="Issue number within the decomposition")
+    title: str = Field(..., description="Issue title")
+    body: str = Field(..., description="Issue body in Markdown")
+    deps: list[int] = Field(
+        default_factory=list, description="Numbers of issues this depends on"
+    )
 
-def get_api_client() -> Anthropic:
+
+class Decomposition(BaseModel):
+    """All issues decomposed from a specification."""
+
+    issues: list[DecomposedIssue] = Field(..., description="Issues in order")
+
+
+# Validates Claude's JSON array output while parsing it
+_issue_list_adapter = TypeAdapter(list[DecomposedIssue])
+
+
+@lru_cache(maxsize=1)
+def get_api_client() -> AsyncAnthropic:
     """
-    Get authenticated Anthropic API client.
+    Get the shared authenticated async Anthropic API client.
+
+    The client is created once per process so its connection pool, and the
+    TLS sessions in it, are reused across calls.
 
-    :returns: Authenticated Anthropic client
+    :returns: Authenticated AsyncAnthropic client
     :raises: SystemExit if ANTHROPIC_API_KEY not set
     """
     api_key = os.environ.get("ANTHROPIC_API_KEY")
@@ -27,7 +192,13 @@ def get_api_client() -> Anthropic:
         logger.error("ANTHROPIC_API_KEY environment variable not set")
         raise SystemExit(1)
 
-    return Anthropic(api_key=api_key)
+    return AsyncAnthropic(
+        api_key=api_key,
+        max_retries=3,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+        ),
+    )
 
 
 def read_file(path: Path) -> str:
@@ -37,215 +208,635 @@ def read_file(path: Path) -> str:
     :param path: Path to file
     :returns: File contents as string
     """
-    with open(path) as f:
-        return f.read()
+    return path.read_text(encoding="utf-8")
 
 
 def write_file(path: Path, content: str) -> None:
     """
-    Write content to file.
+    Write content to file atomically.
+
+    Content goes to a uniquely named sibling temporary file that then
+    replaces the target, so an interrupted write never leaves a partial
+    file behind and concurrent writers never share a temporary file. An
+    existing target keeps its permission bits; a new one gets the umask
+    default, as with open().
 
     :param path: Path to file
     :param content: Content to write
     """
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w") as f:
-        f.write(content)
-
-
-def run_command(cmd: list[str], check: bool = True) -> subprocess.CompletedProcess:
+    with tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=path.parent,
+        prefix=f".{path.name}.",
+        suffix=".tmp",
+        delete=False,
+    ) as tmp:
+        tmp_path = Path(tmp.name)
+        try:
+            tmp.write(content)
+        except BaseException:
+            tmp.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    try:
+        if path.exists():
+            shutil.copymode(path, tmp_path)
+        else:
+            # NamedTemporaryFile creates 0600 files; use the usual default
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+async def run_command(
+    cmd: list[str], check: bool = True, capture: bool = True, text: bool = True
+) -> subprocess.CompletedProcess:
     """
-    Run shell command.
+    Run shell command without blocking the event loop.
 
     :param cmd: Command as list of strings
     :param check: Whether to raise on non-zero exit
+    :param capture: Whether to capture output; if False it goes straight to
+        this process's stdout/stderr and the result's output fields are None
+    :param text: Whether to decode captured output to str; pass False when
+        the bytes are consumed directly, e.g. by json.loads
     :returns: CompletedProcess result
+    :raises: subprocess.CalledProcessError if check is set and the command fails
     """
     logger.debug(f"Running: {' '.join(cmd)}")
-    return subprocess.run(cmd, capture_output=True, text=True, check=check)
+    pipe = asyncio.subprocess.PIPE if capture else None
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=pipe, stderr=pipe)
+    stdout, stderr = await proc.communicate()
+    if capture and text:
+        stdout, stderr = stdout.decode(), stderr.decode()
+    result = subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+    if check:
+        result.check_returncode()
+    return result
+
+
+class _StreamProgress:
+    """Text received so far on a stream, as reported by _heartbeat."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.chunks = 0
+        self.chars = 0
+        self.last_chunk_at: float | None = None
+
+    def update(self, text: str) -> None:
+        """
+        Record a chunk of streamed text.
+
+        :param text: Chunk just received
+        """
+        self.chunks += 1
+        self.chars += len(text)
+        self.last_chunk_at = time.monotonic()
+
+
+@asynccontextmanager
+async def _heartbeat(label: str):
+    """
+    Log streaming progress every HEARTBEAT_INTERVAL seconds.
 
+    Callers report each chunk through the yielded _StreamProgress, so the
+    log shows whether text is still arriving; wrapping jobs can watch it
+    instead of guessing a blind timeout. If the surrounding task is
+    cancelled (e.g. Ctrl-C under asyncio.run), leaving the stream context
+    closes the connection, which stops generation.
 
-def decompose_spec(spec_path: Path, max_turns: int = 20) -> dict:
+    :param label: Identifies the request in log lines
+    :returns: Progress tracker to update with each received chunk
     """
-    Decompose specification into GitHub issues using Claude.
+    progress = _StreamProgress()
+
+    async def beat() -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            elapsed = now - progress.started
+            if progress.last_chunk_at is None:
+                logger.info(f"heartbeat {label} waiting elapsed={elapsed:.1f}s")
+                continue
+            logger.info(
+                f"heartbeat {label} chunks={progress.chunks} chars={progress.chars} "
+                f"idle={now - progress.last_chunk_at:.1f}s elapsed={elapsed:.1f}s"
+            )
 
-    :param spec_path: Path to specification file
-    :param max_turns: Maximum conversation turns
-    :returns: Dictionary with issue data
-    """
-    client = get_api_client()
-    spec_content = read_file(spec_path)
+    task = asyncio.create_task(beat())
+    try:
+        yield progress
+    except asyncio.CancelledError:
+        logger.warning(f"{label} cancelled, closing stream")
+        raise
+    finally:
+        task.cancel()
 
-    prompt = f"""Read the following specification and decompose it into implementable GitHub issues.
 
-SPECIFICATION:
-{spec_content}
+def _cache_tagged(message: dict) -> dict:
+    """
+    Copy a message with its last content block marked for prompt caching.
 
-For each issue you identify:
-1. Create a clear, specific title
-2. Write detailed acceptance criteria
-3. Specify what unit tests are required
-4. Identify dependencies on other issues (by issue number)
+    :param message: Message with string or content-block content
+    :returns: Tagged copy of the message
+    """
+    content = message["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = [dict(block) for block in content]
+    blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    return {"role": message["role"], "content": blocks}
 
-Guidelines:
-- Break down large features into smaller, testable units
-- Issue #0 should be test framework setup if not already present
-- Ensure each issue can be implemented independently once dependencies are met
-- Order issues logically (foundations before features)
-- Use "depends on #N" in issue body to indicate dependencies
 
-Output a JSON array of issues with this structure:
-[
-  {{
-    "number": 0,
-    "title": "Setup test framework",
-    "body": "Description\\n\\n## Dependencies\\nNone\\n\\n## Acceptance Criteria\\n- [ ] pytest installed\\n- [ ] Sample test passes\\n\\n## Tests Required\\n- Verify test framework works",
-    "deps": []
-  }},
-  {{
-    "number": 1,
-    "title": "Implement user model",
-    "body": "Description\\n\\n## Dependencies\\n- #0\\n\\n## Acceptance Criteria\\n- [ ] User class created\\n\\n## Tests Required\\n- Unit tests for User model",
-    "deps": [0]
-  }}
-]
+def _with_cache_breakpoints(conversation: list[dict]) -> list[dict]:
+    """
+    Mark the two newest user messages as prompt cache breakpoints.
+
+    The older one ends the prefix sent on the previous turn, so it is read
+    back from cache; the newest one writes the prefix for the next turn.
+    Each prefix includes the system prompt, and is only cached once it
+    reaches the model's minimum cacheable length (1024 tokens for Sonnet,
+    2048 for Haiku); shorter prefixes are simply sent uncached. The stored
+    conversation is left untouched so breakpoints never pile up past the
+    API limit.
+
+    :param conversation: Conversation messages
+    :returns: Copy of the conversation with breakpoints added
+    """
+    tagged = list(conversation)
+    user_indices = [i for i, m in enumerate(conversation) if m["role"] == "user"]
+    for i in user_indices[-2:]:
+        tagged[i] = _cache_tagged(conversation[i])
+    return tagged
 
-Only output the JSON array, nothing else."""
 
-    response = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=4096,
-        messages=[{"role": "user", "content": prompt}],
+async def _summarize_turns(
+    client: AsyncAnthropic, summary: str, messages: list[dict]
+) -> str:
+    """
+    Fold older conversation turns into a running summary using a small model.
+
+    :param client: Anthropic client
+    :param summary: Summary of turns folded in previously (may be empty)
+    :param messages: Messages to add to the summary
+    :returns: Updated summary text
+    """
+    transcript = "\n\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+    response = await client.messages.create(
+        model=SUMMARY_MODEL,
+        max_tokens=512,
+        messages=[
+            {
+                "role": "user",
+                "content": f"""Summarize the progress of this implementation session so it can be continued without the full transcript. Keep decisions made, files touched, test status and open problems. Be concise.
+
+PREVIOUS SUMMARY:
+{summary or "None"}
+
+NEW TURNS:
+{transcript}""",
+            }
+        ],
     )
+    return response.content[0].text
 
-    # Extract JSON from response
-    content = response.content[0].text
-    # Find JSON array in response
-    start = content.find("[")
-    end = content.rfind("]") + 1
-    if start == -1 or end == 0:
+
+class _JsonArrayTracker:
+    """
+    Locate the first top-level JSON array in streamed text in a single pass.
+
+    After feed() reports the array closed, ``start`` and ``end`` delimit it
+    within the concatenation of all chunks fed so far.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.offset = 0
+        self.start = -1
+        self.end = -1
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Consume a chunk of streamed text.
+
+        Brackets inside JSON string literals are ignored.
+
+        :param chunk: Next piece of the response
+        :returns: True once the outermost array has been closed
+        """
+        for i, char in enumerate(chunk):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif self.start == -1:
+                if char == "[":
+                    self.start = self.offset + i
+                    self.depth = 1
+            elif char == '"':
+                self.in_string = True
+            elif char == "[":
+                self.depth += 1
+            elif char == "]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = self.offset + i + 1
+                    return True
+        self.offset += len(chunk)
+        return False
+
+
+async def decompose_spec(
+    spec_path: Path, max_turns: int = 20, cache: bool = True
+) -> Decomposition:
+    """
+    Decompose specification into GitHub issues using Claude.
+
+    Results are cached on disk by spec content, so an unchanged spec is not
+    sent to Claude again until the cache entry expires.
+
+    :param spec_path: Path to specification file
+    :param max_turns: Maximum conversation turns
+    :param cache: Whether to use a cached result (False forces a refresh)
+    :returns: Validated decomposition
+    :raises: ValueError if the response is not a valid list of issues
+    """
+    spec_content = read_file(spec_path)
+
+    key_parts = [
+        MODEL,
+        str(DECOMPOSE_CACHE_VERSION),
+        DECOMPOSE_SYSTEM_PROMPT[0]["text"],
+        spec_content,
+    ]
+    key = hashlib.blake2b("\0".join(key_parts).encode(), digest_size=16).hexdigest()
+    cache_path = DECOMPOSE_CACHE_DIR / f"{key}.json"
+    if (
+        cache
+        and cache_path.exists()
+        and time.time() - cache_path.stat().st_mtime < DECOMPOSE_CACHE_TTL
+    ):
+        try:
+            decomposition = Decomposition.model_validate_json(read_file(cache_path))
+        except ValueError as e:
+            # Corrupt or outdated entry; fall through and decompose again
+            logger.warning(f"Ignoring unreadable decomposition cache entry: {e}")
+        else:
+            logger.info(
+                f"Using cached decomposition ({len(decomposition.issues)} issues)"
+            )
+            return decomposition
+
+    client = get_api_client()
+
+    # Stream the response and hang up as soon as the JSON array is closed,
+    # so any trailing prose is never generated
+    content = ""
+    tracker = _JsonArrayTracker()
+    async with (
+        client.messages.stream(
+            model=MODEL,
+            max_tokens=4096,
+            system=DECOMPOSE_SYSTEM_PROMPT,
+            messages=[{"role": "user", "content": f"SPECIFICATION:\n{spec_content}"}],
+        ) as stream,
+        _heartbeat("decompose") as progress,
+    ):
+        async for text in stream.text_stream:
+            progress.update(text)
+            content += text
+            if tracker.feed(text):
+                break
+
+    # Extract JSON array located by the tracker while streaming
+    if tracker.end == -1:
         logger.error("No JSON array found in Claude's response")
         raise ValueError("Invalid response format")
 
-    issues_data = json.loads(content[start:end])
-    logger.info(f"Decomposed spec into {len(issues_data)} issues")
+    # Parse and validate in one pass so a malformed response fails here,
+    # before any GitHub issues are created
+    decomposition = Decomposition(
+        issues=_issue_list_adapter.validate_json(content[tracker.start : tracker.end])
+    )
+    logger.info(f"Decomposed spec into {len(decomposition.issues)} issues")
+
+    write_file(cache_path, decomposition.model_dump_json())
 
-    return {"issues": issues_data}
+    return decomposition
 
 
-def create_github_issues(issues_data: dict) -> list[int]:
+async def create_github_issues(decomposition: Decomposition) -> list[int]:
     """
     Create GitHub issues from decomposed data.
 
-    :param issues_data: Dictionary containing issue data
+    Issues are created through aliased GraphQL createIssue mutations, up to
+    ISSUES_PER_MUTATION per request, instead of one `gh issue create` per
+    issue. GitHub runs the mutations in order, so the returned numbers keep
+    the order of the input issues.
+
+    :param decomposition: Decomposed issues to create
     :returns: List of created issue numbers
+    :raises: RuntimeError if any issue could not be created; issues created
+        up to that point are logged first
     """
-    created_issues = []
+    result = await run_command(
+        ["gh", "repo", "view", "--json", "id"], check=True, text=False
+    )
+    repository_id = json.loads(result.stdout)["id"]
 
-    for issue in issues_data["issues"]:
-        title = issue["title"]
-        body = issue["body"]
+    issues = decomposition.issues
+    created_issues = []
 
-        result = run_command(
-            ["gh", "issue", "create", "--title", title, "--body", body], check=True
+    for offset in range(0, len(issues), ISSUES_PER_MUTATION):
+        chunk = issues[offset : offset + ISSUES_PER_MUTATION]
+
+        params = []
+        fields = ["-f", f"repositoryId={repository_id}"]
+        mutations = []
+        for i, issue in enumerate(chunk):
+            params.append(f"$title{i}: String!, $body{i}: String!")
+            fields += ["-f", f"title{i}={issue.title}"]
+            fields += ["-f", f"body{i}={issue.body}"]
+            mutations.append(
+                f"issue{i}: createIssue(input: {{repositoryId: $repositoryId, "
+                f"title: $title{i}, body: $body{i}}}) {{ issue {{ number }} }}"
+            )
+        query = (
+            f"mutation($repositoryId: ID!, {', '.join(params)}) "
+            f"{{ {' '.join(mutations)} }}"
         )
 
-        # Extract issue number from output (format: "https://github.com/owner/repo/issues/N")
-        output = result.stdout.strip()
-        issue_num = int(output.split("/")[-1])
-        created_issues.append(issue_num)
-        logger.info(f"Created issue #{issue_num}: {title}")
+        # A failing mutation does not stop the others in the request, so
+        # record whatever was created before reporting the failure
+        result = await run_command(
+            ["gh", "api", "graphql", "-f", f"query={query}", *fields],
+            check=False,
+            text=False,
+        )
+        try:
+            payload = json.loads(result.stdout)
+        except ValueError:
+            payload = {}
+        data = payload.get("data") or {}
+
+        for i, issue in enumerate(chunk):
+            created = data.get(f"issue{i}")
+            if created is None:
+                continue
+            issue_num = created["issue"]["number"]
+            created_issues.append(issue_num)
+            logger.info(f"Created issue #{issue_num}: {issue.title}")
+
+        if result.returncode != 0 or payload.get("errors"):
+            errors = payload.get("errors") or result.stderr.decode().strip()
+            logger.error(f"Issues created before failure: {created_issues}")
+            raise RuntimeError(f"GitHub issue creation failed: {errors}")
 
     return created_issues
 
 
-def implement_issue(issue_number: int, max_turns: int = 30) -> bool:
+async def _fetch_issue(issue_number: int) -> tuple[str, str]:
     """
-    Implement a GitHub issue using Claude with autonomous tool use.
+    Get issue title and body from GitHub, reusing earlier lookups.
 
-    :param issue_number: Issue number to implement
-    :param max_turns: Maximum conversation turns
-    :returns: True if implementation successful
+    :param issue_number: Issue number to fetch
+    :returns: Tuple of (title, body)
     """
-    client = get_api_client()
+    task = _issue_cache.get(issue_number)
+    if task is None:
+        task = asyncio.create_task(_load_issue(issue_number))
+        _issue_cache[issue_number] = task
+        if len(_issue_cache) > ISSUE_CACHE_SIZE:
+            _issue_cache.popitem(last=False)
+    else:
+        _issue_cache.move_to_end(issue_number)
 
-    # Get issue details
-    result = run_command(
-        ["gh", "issue", "view", str(issue_number), "--json", "title,body"], check=True
+    try:
+        # Shielded so one cancelled caller does not cancel the shared lookup
+        return await asyncio.shield(task)
+    except Exception:
+        if _issue_cache.get(issue_number) is task:
+            del _issue_cache[issue_number]
+        raise
+
+
+async def _load_issue(issue_number: int) -> tuple[str, str]:
+    """
+    Get issue title and body from GitHub.
+
+    :param issue_number: Issue number to fetch
+    :returns: Tuple of (title, body)
+    """
+    result = await run_command(
+        ["gh", "issue", "view", str(issue_number), "--json", "title,body"],
+        check=True,
+        text=False,
     )
     issue_data = json.loads(result.stdout)
-    title = issue_data["title"]
-    body = issue_data["body"]
+    return issue_data["title"], issue_data["body"]
 
-    logger.info(f"Implementing issue #{issue_number}: {title}")
 
-    # Read project context
+def _find_context_files(root: str, limit: int = 20, max_depth: int = 4) -> list[str]:
+    """
+    Collect source and manifest files to describe the project layout.
+
+    The walk stops as soon as enough files are found, so large trees are
+    never scanned in full.
+
+    :param root: Directory to start from
+    :param limit: Maximum number of files to return (prevents token overflow)
+    :param max_depth: Maximum directory depth to descend into
+    :returns: Paths of matching files, prefixed with root
+    """
     context_files = []
-    for pattern in [
-        "*.py",
-        "*.js",
-        "*.ts",
-        "*.go",
-        "*.rs",
-        "package.json",
-        "pyproject.toml",
-    ]:
+
+    def walk(directory: str, depth: int) -> None:
+        if depth > max_depth:
+            return
         try:
-            result = run_command(
-                ["find", ".", "-name", pattern, "-type", "f"], check=False
-            )
-            if result.returncode == 0:
-                context_files.extend(result.stdout.strip().split("\n"))
-        except Exception:
-            pass
+            it = os.scandir(directory)
+        except OSError as e:
+            logger.debug(f"Skipping unreadable directory {directory}: {e}")
+            return
+        with it:
+            for entry in it:
+                if len(context_files) >= limit:
+                    return
+                if entry.name.startswith(".git"):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    walk(entry.path, depth + 1)
+                elif (
+                    entry.name in CONTEXT_FILE_NAMES
+                    or os.path.splitext(entry.name)[1] in CONTEXT_FILE_EXTENSIONS
+                ):
+                    context_files.append(entry.path)
+
+    walk(root, 0)
+    return context_files
+
+
+async def _prepare_implementation(issue_number: int) -> list[dict]:
+    """
+    Build the opening conversation for an issue.
+
+    :param issue_number: Issue number to implement
+    :returns: Initial conversation, to be sent with IMPLEMENT_SYSTEM_PROMPT
+    """
+    title, body = await _fetch_issue(issue_number)
+
+    logger.info(f"Implementing issue #{issue_number}: {title}")
 
     # Build context
     context = "Project structure:\n"
-    for f in context_files[:20]:  # Limit to prevent token overflow
-        if f and not f.startswith("./.git"):
-            context += f"- {f}\n"
+    for f in _find_context_files("."):
+        context += f"- {f}\n"
 
-    prompt = f"""You are implementing GitHub issue #{issue_number}.
+    prompt = IMPLEMENT_PROMPT_TEMPLATE.substitute(
+        issue_number=issue_number, title=title, body=body, context=context
+    )
+    return [{"role": "user", "content": prompt}]
 
-ISSUE TITLE: {title}
 
-ISSUE BODY:
-{body}
+def _turn_model(turn: int, last_message: str) -> str:
+    """
+    Choose the model for an implement turn.
 
-PROJECT CONTEXT:
-{context}
+    :param turn: Zero-based turn index
+    :param last_message: Claude's message from the previous turn ("" if none)
+    :returns: Model id to use for the turn
+    """
+    if turn == 0 or PLANNING_PATTERN.search(last_message):
+        return PLANNING_MODEL
+    return MODEL
 
-Your task:
-1. Write comprehensive unit tests for this feature (TDD approach)
-2. Implement the feature to make tests pass
-3. Run the full test suite to ensure no regressions
-4. Ensure all tests pass before completing
 
-Follow the project's existing patterns and conventions. If you need to read or write files, describe what you need and I'll help.
+def _is_complete(message: str) -> bool:
+    """
+    Check whether Claude reported the implementation as finished.
+
+    :param message: Assistant message text
+    :returns: True if the message signals completion
+    """
+    return COMPLETION_PATTERN.search(message) is not None
+
+
+class _ConversationWindow:
+    """
+    Implement conversation with older turns folded into a rolling summary.
 
-Start by analyzing the requirements and planning your test cases."""
+    Turns folded into the summary are dropped from ``conversation``, so
+    memory and request size stay bounded however many turns run.
+    """
 
-    conversation = [{"role": "user", "content": prompt}]
+    def __init__(self, conversation: list[dict]):
+        self.conversation = conversation
+        self.summary = ""
+        # First message as sent: the original prompt plus the current summary
+        self.opening = conversation[0]
+
+    @property
+    def last_reply(self) -> str:
+        """Claude's most recent message, or "" before the first turn."""
+        if len(self.conversation) < 2:
+            return ""
+        return self.conversation[-2]["content"]
+
+    async def compact(self, client: AsyncAnthropic, turn: int) -> None:
+        """
+        Fold all but the last KEEP_TURNS exchanges into the summary.
+
+        Only runs every SUMMARY_INTERVAL turns so the sent prefix stays
+        stable, and cacheable, in between.
+
+        :param client: Anthropic client used for summarization
+        :param turn: Zero-based index of the turn about to be sent
+        """
+        keep_from = len(self.conversation) - 2 * KEEP_TURNS
+        if not turn or turn % SUMMARY_INTERVAL or keep_from <= 1:
+            return
+
+        self.summary = await _summarize_turns(
+            client, self.summary, self.conversation[1:keep_from]
+        )
+        del self.conversation[1:keep_from]
+        self.opening = {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": self.conversation[0]["content"]},
+                {"type": "text", "text": f"SUMMARY OF EARLIER TURNS:\n{self.summary}"},
+            ],
+        }
+        logger.debug(f"Folded {keep_from - 1} messages into the summary")
+
+    def messages(self) -> list[dict]:
+        """
+        Build the messages to send for the next turn.
+
+        :returns: Opening message followed by the unsummarized turns
+        """
+        return [self.opening] + self.conversation[1:]
+
+
+async def implement_issue(issue_number: int, max_turns: int = 30) -> bool:
+    """
+    Implement a GitHub issue using Claude with autonomous tool use.
+
+    :param issue_number: Issue number to implement
+    :param max_turns: Maximum conversation turns
+    :returns: True if implementation successful
+    """
+    client = get_api_client()
+
+    window = _ConversationWindow(await _prepare_implementation(issue_number))
+    conversation = window.conversation
 
     for turn in range(max_turns):
         logger.debug(f"Turn {turn + 1}/{max_turns}")
 
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            messages=conversation,
-        )
+        await window.compact(client, turn)
+
+        # Stream the turn so generation is cancelled as soon as Claude
+        # reports completion
+        assistant_message = ""
+        complete = False
+        async with (
+            client.messages.stream(
+                model=_turn_model(turn, window.last_reply),
+                max_tokens=4096,
+                system=IMPLEMENT_SYSTEM_PROMPT,
+                messages=_with_cache_breakpoints(window.messages()),
+            ) as stream,
+            _heartbeat(f"issue=#{issue_number} turn={turn + 1}") as progress,
+        ):
+            async for text in stream.text_stream:
+                progress.update(text)
+                # Only scan the new chunk plus a short overlap, not the
+                # whole message again
+                scan_from = max(0, len(assistant_message) - COMPLETION_OVERLAP)
+                assistant_message += text
+                if COMPLETION_PATTERN.search(assistant_message, scan_from):
+                    complete = True
+                    break
 
-        assistant_message = response.content[0].text
         conversation.append({"role": "assistant", "content": assistant_message})
 
         logger.debug(f"Claude: {assistant_message[:200]}...")
 
         # Check if implementation is complete
-        if (
-            "implementation complete" in assistant_message.lower()
-            or "all tests pass" in assistant_message.lower()
-        ):
+        if complete:
             logger.info("Implementation reported complete")
             return True
 
@@ -254,36 +845,124 @@ Start by analyzing the requirements and planning your test cases."""
 
         if turn < max_turns - 1:
             # Provide feedback for next turn
-            feedback = "Continue with implementation. What's your next step?"
-            conversation.append({"role": "user", "content": feedback})
+            conversation.append({"role": "user", "content": CONTINUE_FEEDBACK})
 
     logger.warning(f"Reached max turns ({max_turns}) without completion")
     return False
 
 
+async def batch_implement_issues(
+    issue_numbers: list[int], max_turns: int = 30, poll_interval: float = 30.0
+) -> dict[int, bool]:
+    """
+    Implement several GitHub issues through the Message Batches API.
+
+    Each turn of every still-open issue is submitted as one batch, which is
+    billed at half the synchronous rate. Use implement_issue for interactive
+    runs, since a batch may take minutes to process.
+
+    :param issue_numbers: Issue numbers to implement
+    :param max_turns: Maximum conversation turns per issue
+    :param poll_interval: Seconds to wait between batch status checks
+    :returns: Mapping of issue number to implementation success
+    """
+    client = get_api_client()
+
+    prepared = await asyncio.gather(
+        *[_prepare_implementation(n) for n in issue_numbers]
+    )
+    pending = {
+        n: _ConversationWindow(conversation)
+        for n, conversation in zip(issue_numbers, prepared)
+    }
+    results = {n: False for n in issue_numbers}
+
+    for turn in range(max_turns):
+        if not pending:
+            break
+        logger.debug(f"Batch turn {turn + 1}/{max_turns} ({len(pending)} issues)")
+
+        await asyncio.gather(*[w.compact(client, turn) for w in pending.values()])
+
+        batch = await client.messages.batches.create(
+            requests=[
+                {
+                    "custom_id": f"issue-{n}",
+                    "params": {
+                        "model": _turn_model(turn, window.last_reply),
+                        "max_tokens": 4096,
+                        "system": IMPLEMENT_SYSTEM_PROMPT,
+                        "messages": _with_cache_breakpoints(window.messages()),
+                    },
+                }
+                for n, window in pending.items()
+            ]
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(pending)} requests")
+
+        while batch.processing_status != "ended":
+            await asyncio.sleep(poll_interval)
+            batch = await client.messages.batches.retrieve(batch.id)
+
+        async for entry in await client.messages.batches.results(batch.id):
+            issue_number = int(entry.custom_id.removeprefix("issue-"))
+            conversation = pending[issue_number].conversation
+
+            if entry.result.type != "succeeded":
+                logger.error(
+                    f"Issue #{issue_number}: batch request {entry.result.type}"
+                )
+                del pending[issue_number]
+                continue
+
+            assistant_message = entry.result.message.content[0].text
+            conversation.append({"role": "assistant", "content": assistant_message})
+            logger.debug(f"Claude (#{issue_number}): {assistant_message[:200]}...")
+
+            if _is_complete(assistant_message):
+                logger.info(f"Issue #{issue_number}: implementation reported complete")
+                results[issue_number] = True
+                del pending[issue_number]
+            else:
+                conversation.append({"role": "user", "content": CONTINUE_FEEDBACK})
+
+    for issue_number in pending:
+        logger.warning(
+            f"Issue #{issue_number}: reached max turns ({max_turns}) without completion"
+        )
+    return results
+
+
 if __name__ == "__main__":
     import sys
 
     if len(sys.argv) < 2:
         print("Usage: claude_api.py <command> [args]")
         print("Commands:")
-        print("  decompose <spec_file>  - Decompose spec into issues")
-        print("  implement <issue_num>  - Implement an issue")
+        print("  decompose <spec_file>         - Decompose spec into issues")
+        print("  implement <issue_num>         - Implement an issue")
+        print("  implement <issue_num> ...     - Implement several issues in batch")
         sys.exit(1)
 
     command = sys.argv[1]
 
     if command == "decompose":
         spec_file = Path(sys.argv[2]) if len(sys.argv) > 2 else Path("README.md")
-        result = decompose_spec(spec_file)
-        print(json.dumps(result, indent=2))
+        result = asyncio.run(decompose_spec(spec_file))
+        print(result.model_dump_json(indent=2))
 
     elif command == "implement":
         if len(sys.argv) < 3:
             print("Error: Issue number required")
             sys.exit(1)
+        if len(sys.argv) > 3:
+            results = asyncio.run(
+                batch_implement_issues([int(arg) for arg in sys.argv[2:]])
+            )
+            print(json.dumps(results, indent=2))
+            sys.exit(0 if all(results.values()) else 1)
         issue_num = int(sys.argv[2])
-        success = implement_issue(issue_num)
+        success = asyncio.run(implement_issue(issue_num))
         sys.exit(0 if success else 1)
 
     else:
@@ -0,0 +1,247 @@
+"""Tests for the Claude API helper script in .claude/scripts."""
+
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / ".claude" / "scripts"))
+
+import claude_api  # noqa: E402
+
+
+def _track(*chunks):
+    tracker = claude_api._JsonArrayTracker()
+    for chunk in chunks:
+        if tracker.feed(chunk):
+            return tracker, "".join(chunks)[tracker.start : tracker.end]
+    return tracker, None
+
+
+def test_tracker_ignores_brackets_and_escaped_quotes_in_strings():
+    text = (
+        'Here you go: [{"title": "Fix ] and [ \\"quoted]\\" text", "deps": [1]}] done'
+    )
+    tracker, array = _track(text)
+    assert array == text[text.index("[") : text.rindex("]") + 1]
+    assert json.loads(array)[0]["title"] == 'Fix ] and [ "quoted]" text'
+
+
+def test_tracker_finds_array_split_across_chunks():
+    text = 'Plan:\n[{"title": "a\\"]", "deps": []}, {"title": "b", "deps": [1]}]\nEnd'
+    # Split at every position, including inside escapes and strings
+    for cut in range(1, len(text)):
+        for second in range(cut + 1, len(text)):
+            tracker, array = _track(text[:cut], text[cut:second], text[second:])
+            assert array == text[6 : text.rindex("]") + 1]
+            assert len(json.loads(array)) == 2
+
+
+def test_tracker_reports_truncated_array_as_open():
+    tracker, array = _track('[{"title": "a", "deps": [1', "]}, ")
+    assert array is None
+    assert tracker.start == 0
+    assert tracker.end == -1
+
+
+class _FakeGitHub:
+    """Stand-in for run_command that answers `gh` calls like the GraphQL API."""
+
+    def __init__(self, fail_title=None):
+        self.fail_title = fail_title
+        self.requests = []
+        self.next_number = 1
+
+    async def __call__(self, cmd, check=True, capture=True, text=True):
+        if cmd[:3] == ["gh", "repo", "view"]:
+            return SimpleNamespace(stdout=b'{"id": "R_1"}', stderr=b"", returncode=0)
+
+        titles = {}
+        for arg in cmd:
+            key, _, value = arg.partition("=")
+            if key.startswith("title"):
+                titles[int(key[len("title") :])] = value
+        self.requests.append(titles)
+
+        data, errors = {}, []
+        for i in sorted(titles):
+            if titles[i] == self.fail_title:
+                data[f"issue{i}"] = None
+                errors.append({"path": [f"issue{i}"], "message": "boom"})
+            else:
+                data[f"issue{i}"] = {"issue": {"number": self.next_number}}
+                self.next_number += 1
+        payload = {"data": data}
+        if errors:
+            payload["errors"] = errors
+        return SimpleNamespace(
+            stdout=json.dumps(payload).encode(),
+            stderr=b"",
+            returncode=1 if errors else 0,
+        )
+
+
+def _decomposition(count):
+    return claude_api.Decomposition(
+        issues=[
+            claude_api.DecomposedIssue(number=n, title=f"Issue {n}", body="", deps=[])
+            for n in range(1, count + 1)
+        ]
+    )
+
+
+def test_create_github_issues_splits_mutations(monkeypatch):
+    github = _FakeGitHub()
+    monkeypatch.setattr(claude_api, "run_command", github)
+
+    created = asyncio.run(claude_api.create_github_issues(_decomposition(45)))
+
+    assert created == list(range(1, 46))
+    assert [len(r) for r in github.requests] == [20, 20, 5]
+    assert github.requests[2][4] == "Issue 45"
+
+
+def test_create_github_issues_records_issues_before_failure(monkeypatch):
+    github = _FakeGitHub(fail_title="Issue 23")
+    monkeypatch.setattr(claude_api, "run_command", github)
+    messages = []
+    sink = logger.add(messages.append, format="{message}")
+
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            asyncio.run(claude_api.create_github_issues(_decomposition(45)))
+    finally:
+        logger.remove(sink)
+
+    # The failing request still creates the issues around the bad one, and
+    # no further request is sent
+    assert len(github.requests) == 2
+    recorded = [m for m in messages if "Issues created before failure" in m]
+    assert recorded == [f"Issues created before failure: {list(range(1, 40))}\n"]
+    assert "Created issue #39: Issue 40" in "".join(messages)
+
+
+class _FakeStream:
+    def __init__(self, text):
+        self.text = text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for word in self.text.split(" "):
+            yield word + " "
+
+
+class _FakeMessages:
+    """Records stream() requests and answers summary create() calls."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.streamed = []
+        self.summaries = 0
+
+    def stream(self, **params):
+        self.streamed.append(params)
+        return _FakeStream(self.reply)
+
+    async def create(self, **params):
+        self.summaries += 1
+        return SimpleNamespace(content=[SimpleNamespace(text="summary")])
+
+
+def _cache_tags(params):
+    blocks = list(params["system"])
+    for message in params["messages"]:
+        if not isinstance(message["content"], str):
+            blocks += message["content"]
+    return sum("cache_control" in block for block in blocks)
+
+
+def test_implement_issue_compacts_long_conversations(monkeypatch):
+    messages = _FakeMessages("Edited the module and ran the suite. " * 50)
+    client = SimpleNamespace(messages=messages)
+
+    async def prepare(issue_number):
+        return [{"role": "user", "content": f"Implement #{issue_number}"}]
+
+    monkeypatch.setattr(claude_api, "get_api_client", lambda: client)
+    monkeypatch.setattr(claude_api, "_prepare_implementation", prepare)
+
+    assert asyncio.run(claude_api.implement_issue(7, max_turns=30)) is False
+
+    assert len(messages.streamed) == 30
+    assert messages.summaries > 0
+    max_messages = 1 + 2 * claude_api.KEEP_TURNS + 2 * (claude_api.SUMMARY_INTERVAL - 1)
+    for params in messages.streamed:
+        roles = [m["role"] for m in params["messages"]]
+        assert roles == ["user", "assistant"] * (len(roles) // 2) + ["user"]
+        assert _cache_tags(params) <= 2
+        assert len(params["messages"]) <= max_messages
+    # Request size levels off instead of growing with every turn
+    sizes = [len(json.dumps(p["messages"])) for p in messages.streamed]
+    assert max(sizes[20:]) <= max(sizes[:20])
+
+
+def _touch(root, *paths):
+    for path in paths:
+        file = root / path
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text("")
+
+
+def _relative(root, paths):
+    return sorted(os.path.relpath(path, root) for path in paths)
+
+
+def test_find_context_files_depth_and_names(tmp_path):
+    _touch(
+        tmp_path,
+        "main.py",
+        "package.json",
+        "notes.txt",
+        "a/b/c/d/deepest.py",
+        "a/b/c/d/e/too_deep.py",
+        ".git/hooks/hook.py",
+        ".github/workflows/check.py",
+    )
+
+    found = claude_api._find_context_files(str(tmp_path))
+
+    assert _relative(tmp_path, found) == [
+        os.path.join("a", "b", "c", "d", "deepest.py"),
+        "main.py",
+        "package.json",
+    ]
+
+
+def test_find_context_files_stops_at_limit(tmp_path):
+    _touch(tmp_path, *[f"pkg{i}/mod{j}.py" for i in range(5) for j in range(5)])
+
+    assert len(claude_api._find_context_files(str(tmp_path), limit=7)) == 7
+    assert len(claude_api._find_context_files(str(tmp_path), limit=100)) == 25
+
+
+def test_find_context_files_skips_unreadable_directory(tmp_path, monkeypatch):
+    _touch(tmp_path, "ok/good.py", "locked/hidden.py")
+    scandir = os.scandir
+
+    def guarded_scandir(path):
+        if os.path.basename(path) == "locked":
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(claude_api.os, "scandir", guarded_scandir)
+
+    found = claude_api._find_context_files(str(tmp_path))
+
+    assert _relative(tmp_path, found) == [os.path.join("ok", "good.py")]